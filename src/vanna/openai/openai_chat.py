@@ -1,12 +1,67 @@
+import asyncio
+import contextlib
+import contextvars
+import hashlib
+import io
+import json
 import os
+import time
 
-from openai import OpenAI
+import openai
+from openai import AsyncAzureOpenAI, AsyncOpenAI, AzureOpenAI, OpenAI
+from openai.lib.azure import API_KEY_SENTINEL
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
 
 from ..base import VannaBase
+from ..exceptions import DependencyError
+from ..utils import normalize, rerank
+
+# aiohttp session shared by the requests of one submit_prompts_batch call and the tasks it spawns
+_aiohttp_session = contextvars.ContextVar("vanna_openai_aiohttp_session", default=None)
+# Async SDK clients opened for one submit_prompts_batch call, keyed by the id of the OpenAI_Chat instance
+_async_clients = contextvars.ContextVar("vanna_openai_async_clients", default=None)
+
+
+def _log_retry(retry_state):
+    retry_state.args[0].log(
+        f"{retry_state.fn.__name__} attempt {retry_state.attempt_number} failed with "
+        f"{retry_state.outcome.exception()!r}; retrying in {retry_state.next_action.sleep:.1f}s "
+        f"({retry_state.idle_for:.1f}s spent waiting so far)",
+        title="Retry",
+    )
+
+
+def _is_retryable(exception) -> bool:
+    if isinstance(
+        exception, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+    ):
+        return True
+
+    # Errors raised by the fast_transport="aiohttp" path
+    try:
+        import aiohttp
+    except ImportError:
+        return False
+
+    if isinstance(exception, aiohttp.ClientResponseError):
+        return exception.status == 429 or exception.status >= 500
+    return isinstance(exception, (aiohttp.ClientConnectionError, asyncio.TimeoutError))
+
+
+# Rate limits, timeouts, dropped connections and 5xx responses are retried with jittered exponential backoff.
+# Clients created by OpenAI_Chat disable the SDK's own retries so attempts don't multiply; clients passed
+# in by the caller keep their max_retries, and each attempt here may retry that many times internally.
+_retry_api_call = retry(
+    wait=wait_random_exponential(min=1, max=60),
+    stop=stop_after_attempt(3),
+    retry=retry_if_exception(_is_retryable),
+    before_sleep=_log_retry,
+    reraise=True,
+)
 
 
 class OpenAI_Chat(VannaBase):
-    def __init__(self, client=None, config=None):
+    def __init__(self, client=None, config=None, aclient=None):
         VannaBase.__init__(self, config=config)
 
         # Ensure config is a dictionary
@@ -15,6 +70,38 @@ class OpenAI_Chat(VannaBase):
         # default parameters - can be overrided using config
         self.temperature = config.get("temperature", 0.7)
         self.model = config.get("model", "gpt-4o-mini")
+        self.concurrency = config.get("concurrency", 32)
+        # "aiohttp" posts to the chat completions endpoint directly, bypassing the SDK's httpx client
+        self.fast_transport = config.get("fast_transport")
+        # Pre-serialized request body prefix for the aiohttp path, rebuilt when the stable messages change
+        self._prefix_key = None
+        self._prefix_bytes = None
+        # Routing hint for OpenAI's automatic prompt caching. Unless set explicitly (None omits it),
+        # it is only sent to api.openai.com, since other backends may reject unknown fields.
+        self.prompt_cache_key = config.get("prompt_cache_key")
+        self._default_prompt_cache_key = "prompt_cache_key" not in config
+        self._prefix_warning_logged = False
+        # tiktoken encoding, loaded on first use
+        self._enc = None
+
+        # Response cache: exact prompt hash on disk (L1), plus an in-process
+        # embedding index for near-duplicate prompts (L2). Enabled by "cache_dir".
+        self.cache_dir = config.get("cache_dir")
+        self.cache_similarity_threshold = config.get("cache_similarity_threshold", 0.92)
+        self.cache_max_entries = config.get("cache_max_entries", 1024)
+        self._response_cache = None
+        self._cache_embeddings = None
+        self._cache_entries = []
+        if self.cache_dir:
+            try:
+                import diskcache
+            except ImportError:
+                raise DependencyError(
+                    "You need to install required dependencies to execute this method."
+                    "\nRun the following command:\n"
+                    "pip install diskcache"
+                )
+            self._response_cache = diskcache.Cache(self.cache_dir)
 
         # Raise exceptions for deprecated parameters
         for deprecated_param in ["api_type", "api_base", "api_version"]:
@@ -23,16 +110,104 @@ class OpenAI_Chat(VannaBase):
                     f"Passing {deprecated_param} is now deprecated. Please pass an OpenAI client instead."
                 )
 
-        if client is not None:
-            self.client = client
+        # Clients are created on first use; "api_key" in config takes precedence over OPENAI_API_KEY
+        self._client = client
+        self._aclient = aclient
+        self._aclient_supplied = aclient is not None
+        self._api_key = config.get("api_key") or os.getenv("OPENAI_API_KEY")
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = OpenAI(api_key=self._api_key, max_retries=0)
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    @property
+    def aclient(self):
+        # A derived or lazily created client only supplies request options; requests go through
+        # a client opened by _aclient_scope on the running loop
+        if self._aclient is None:
+            self._aclient = self._new_async_client()
+        return self._aclient
+
+    @aclient.setter
+    def aclient(self, aclient):
+        self._aclient = aclient
+        self._aclient_supplied = aclient is not None
+
+    def _new_async_client(self):
+        if self._client is not None:
+            return self._async_client_from(self._client)
+        return AsyncOpenAI(api_key=self._api_key, max_retries=0)
+
+    @contextlib.asynccontextmanager
+    async def _aclient_scope(self):
+        """
+        Yields the async client to send requests with. A client passed as `aclient` is used as is.
+        Otherwise a new client is opened for the enclosing `submit_prompts_batch` call (or for the
+        duration of the block) and closed with it, since its connection pool is bound to the event
+        loop that first used it and would fail on the next `asyncio.run`.
+        """
+        if self._aclient_supplied:
+            yield self.aclient
             return
 
-        if client is None:
-            self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        clients = _async_clients.get() or {}
+        if id(self) in clients:
+            yield clients[id(self)]
             return
 
-        if "api_key" in config:
-            self.client = OpenAI(api_key=config["api_key"])
+        async with self._new_async_client() as aclient:
+            token = _async_clients.set({**clients, id(self): aclient})
+            try:
+                yield aclient
+            finally:
+                _async_clients.reset(token)
+
+    @staticmethod
+    def _async_client_from(client):
+        """
+        Builds an async client with the same endpoint, credentials, and request options as a
+        sync `OpenAI` or `AzureOpenAI` client. Anything else (subclasses, custom http clients)
+        cannot be mirrored reliably, so the matching async client must be passed as `aclient`.
+        """
+        options = dict(
+            organization=client.organization,
+            project=client.project,
+            default_headers=client._custom_headers or None,
+            timeout=client.timeout,
+            max_retries=client.max_retries,
+        )
+
+        if type(client) is AzureOpenAI:
+            # api-version is re-added by the Azure client itself
+            default_query = {k: v for k, v in client._custom_query.items() if k != "api-version"}
+            return AsyncAzureOpenAI(
+                api_key=client.api_key if client.api_key != API_KEY_SENTINEL else None,
+                api_version=client._api_version,
+                azure_ad_token=client._azure_ad_token,
+                azure_ad_token_provider=client._azure_ad_token_provider,
+                base_url=str(client.base_url),
+                default_query=default_query or None,
+                **options,
+            )
+
+        if type(client) is OpenAI:
+            return AsyncOpenAI(
+                api_key=client.api_key,
+                base_url=client.base_url,
+                default_query=client._custom_query or None,
+                **options,
+            )
+
+        raise ValueError(
+            f"Cannot derive an async client from {type(client).__name__}. "
+            "Please pass the matching async client as `aclient`."
+        )
 
     def system_message(self, message: str) -> dict:
         return {"role": "system", "content": message}
@@ -43,6 +218,7 @@ class OpenAI_Chat(VannaBase):
     def assistant_message(self, message: str) -> dict:
         return {"role": "assistant", "content": message}
 
+    @_retry_api_call
     def generate_response(self, prompt, num_tokens):
         print(f"Using model {self.model} for {num_tokens} tokens (approx)")
         response = self.client.chat.completions.create(
@@ -50,24 +226,198 @@ class OpenAI_Chat(VannaBase):
             messages=prompt,
             stop=None,
             temperature=self.temperature,
+            extra_body=self._extra_body(self.client),
         )
         return response
 
-    def submit_prompt(self, prompt, **kwargs) -> dict:
+    @_retry_api_call
+    async def agenerate_response(self, prompt, num_tokens):
+        print(f"Using model {self.model} for {num_tokens} tokens (approx)")
+        if self.fast_transport == "aiohttp":
+            return await self._aiohttp_generate_response(prompt)
+
+        async with self._aclient_scope() as aclient:
+            response = await aclient.chat.completions.create(
+                model=self.model,
+                messages=prompt,
+                stop=None,
+                temperature=self.temperature,
+                extra_body=self._extra_body(aclient),
+            )
+        return response
+
+    def _extra_body(self, client) -> dict:
+        prompt_cache_key = self.prompt_cache_key
+        if self._default_prompt_cache_key and client.base_url.host == "api.openai.com":
+            prompt_cache_key = f"{self.model}|vanna"
+
+        if not prompt_cache_key:
+            return {}
+        return {"prompt_cache_key": prompt_cache_key}
+
+    def _canonicalize(self, prompt) -> list:
+        """
+        Puts the prompt in a byte-stable order so OpenAI's prompt cache can match its prefix:
+        system messages (instructions, DDL, documentation) first, then the few-shot
+        user/assistant turns in their original order, with the latest question last.
+        Trailing whitespace is stripped so otherwise identical prompts produce identical bytes.
+        """
+        system = [message for message in prompt if message["role"] == "system"]
+        conversation = [message for message in prompt if message["role"] != "system"]
+
+        canonical = []
+        for message in system + conversation:
+            content = message["content"]
+            canonical.append({**message, "content": content.rstrip() if isinstance(content, str) else content})
+
+        return canonical
+
+    def _check_prompt_cache_prefix(self, prefix_tokens: int):
+        # Logged once per instance: short prompts (follow-ups, summaries) are expected and common
+        if prefix_tokens < 1024 and not self._prefix_warning_logged:
+            self._prefix_warning_logged = True
+            self.log(
+                f"Prompt prefix is {prefix_tokens} tokens; OpenAI only caches prefixes of 1024 tokens or more.",
+                title="Prompt Cache",
+            )
+
+    @contextlib.asynccontextmanager
+    async def _aiohttp_session_scope(self):
+        """
+        Yields the aiohttp session of the enclosing `submit_prompts_batch` call, or opens one for
+        the duration of the block. Sessions never outlive the event loop they were created on.
+        """
+        session = _aiohttp_session.get()
+        if session is not None and not session.closed:
+            yield session
+            return
+
+        try:
+            import aiohttp
+        except ImportError:
+            raise DependencyError(
+                "You need to install required dependencies to execute this method."
+                "\nRun the following command:\n"
+                "pip install aiohttp"
+            )
+
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=256)) as session:
+            token = _aiohttp_session.set(session)
+            try:
+                yield session
+            finally:
+                _aiohttp_session.reset(token)
+
+    async def _aiohttp_request_options(self) -> tuple:
+        # Same endpoint, auth scheme, and default headers/query as the SDK client would use
+        aclient = self.aclient
+        if not isinstance(aclient, AsyncAzureOpenAI):
+            auth = {"Authorization": f"Bearer {aclient.api_key}"}
+        elif aclient.api_key and aclient.api_key != API_KEY_SENTINEL:
+            auth = {"api-key": aclient.api_key}
+        else:
+            # Azure AD auth: the client holds a placeholder api_key and a token or token provider
+            token = await aclient._get_azure_ad_token()
+            auth = {"Authorization": f"Bearer {token}"} if token else {}
+
+        headers = {**aclient._custom_headers, **auth, "Content-Type": "application/json"}
+        url = f"{str(aclient.base_url).rstrip('/')}/chat/completions"
+        return url, headers, dict(aclient._custom_query)
+
+    def _serialize_request_body(self, prompt) -> bytes:
+        """
+        Serializes the chat completion request, reusing the encoded bytes of everything but the
+        final message while the model, parameters, and stable messages stay the same. Besides
+        skipping redundant encoding, this keeps the prefix byte-identical for OpenAI's prompt cache.
+        """
+        try:
+            import orjson
+        except ImportError:
+            raise DependencyError(
+                "You need to install required dependencies to execute this method."
+                "\nRun the following command:\n"
+                "pip install orjson"
+            )
+
+        stable, last = prompt[:-1], prompt[-1]
+        params = {"model": self.model, "temperature": self.temperature, **self._extra_body(self.aclient)}
+        key = (tuple(params.items()), tuple(tuple(m.items()) for m in stable))
+        try:
+            hash(key)
+        except TypeError:
+            # Multi-part (list) message content cannot be keyed; serialize the whole request
+            return orjson.dumps({**params, "messages": prompt})
+
+        if key != self._prefix_key:
+            head = orjson.dumps(params)
+            messages = orjson.dumps(stable)[1:-1]
+            self._prefix_bytes = head[:-1] + b',"messages":[' + messages + (b"," if messages else b"")
+            self._prefix_key = key
+
+        return self._prefix_bytes + orjson.dumps(last) + b"]}"
+
+    async def _aiohttp_generate_response(self, prompt):
+        from openai.types.chat import ChatCompletion
+
+        url, headers, params = await self._aiohttp_request_options()
+        body = self._serialize_request_body(prompt)
+
+        async with self._aiohttp_session_scope() as session:
+            async with session.post(url, data=body, headers=headers, params=params) as resp:
+                resp.raise_for_status()
+                data = await resp.json()
+
+        return ChatCompletion.model_validate(data)
+
+    def _prepare_prompt(self, prompt) -> tuple:
+        """
+        Validates and canonicalizes the prompt and counts its tokens, encoding each message once.
+
+        Returns:
+            tuple: The canonical prompt and its token count.
+        """
         if prompt is None:
             raise ValueError("Prompt is None")
 
         if len(prompt) == 0:
             raise ValueError("Prompt is empty")
 
-        # Count the number of tokens in the message log
-        # Use 4 as an approximation for the number of characters per token
-        num_tokens = 0
-        for message in prompt:
-            num_tokens += len(message["content"]) / 4
+        prompt = self._canonicalize(prompt)
+        token_counts = self._message_token_counts(prompt)
+
+        # Everything before the final message is the stable, cacheable prefix
+        self._check_prompt_cache_prefix(sum(token_counts[:-1]))
+        return prompt, sum(token_counts)
 
-        response = self.generate_response(prompt, num_tokens)
+    def _get_encoding(self):
+        """
+        Returns the tiktoken encoding for the model, or None when it cannot be loaded: tiktoken
+        is not installed, or its BPE file cannot be downloaded (e.g. on an offline host).
+        The failure is remembered so later calls don't retry the download.
+        """
+        if self._enc is None:
+            try:
+                import tiktoken
 
+                try:
+                    self._enc = tiktoken.encoding_for_model(self.model)
+                except KeyError:
+                    self._enc = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                self.log(f"Falling back to approximate token counts: {e!r}", title="Tokenizer")
+                self._enc = False
+        return self._enc or None
+
+    def _message_token_counts(self, messages) -> list:
+        contents = [message["content"] if isinstance(message["content"], str) else "" for message in messages]
+        enc = self._get_encoding()
+        if enc is None:
+            # Use 4 as an approximation for the number of characters per token
+            return [len(content) // 4 for content in contents]
+
+        return [len(tokens) for tokens in enc.encode_batch(contents, num_threads=8, disallowed_special=())]
+
+    def _extract_content(self, response) -> str:
         # Find the first response from the chatbot that has text in it (some responses may not have text)
         for choice in response.choices:
             if "text" in choice:
@@ -75,3 +425,193 @@ class OpenAI_Chat(VannaBase):
 
         # If no response with text is found, return the first response's content (which may be empty)
         return response.choices[0].message.content
+
+    def _cache_key(self, prompt) -> str:
+        return hashlib.sha256(json.dumps(prompt, sort_keys=True).encode()).hexdigest() + self.model
+
+    def _cache_context_key(self, prompt) -> str:
+        # Near-duplicate matches are only allowed between prompts whose messages before the
+        # final question (instructions, DDL, documentation, few-shot examples) are identical
+        return hashlib.sha256(json.dumps(prompt[:-1], sort_keys=True).encode()).hexdigest()
+
+    def _cache_embed(self, prompt):
+        embedding_function = getattr(self, "embedding_function", None)
+        if embedding_function is None or not hasattr(embedding_function, "embed_query"):
+            return None
+
+        # Only the final message (the question being asked) is embedded; the rest of the
+        # prompt is matched exactly through the context key
+        question = prompt[-1]["content"]
+        if not isinstance(question, str):
+            return None
+        return normalize(embedding_function.embed_query(question))
+
+    def _cache_lookup(self, prompt):
+        """
+        Returns `(cached_response, embedding)`. `cached_response` is None on a miss; `embedding`
+        is the prompt embedding computed for the L2 lookup, reused by `_cache_store`.
+        """
+        if self._response_cache is None:
+            return None, None
+
+        response = self._response_cache.get(self._cache_key(prompt))
+        if response is not None:
+            return response, None
+
+        embedding = self._cache_embed(prompt)
+        if embedding is None or self._cache_embeddings is None:
+            return None, embedding
+
+        context_key = self._cache_context_key(prompt)
+        indices, scores = rerank(embedding, self._cache_embeddings, k=8)
+        for i, score in zip(indices, scores):
+            if score < self.cache_similarity_threshold:
+                break
+            entry_context_key, entry_key = self._cache_entries[i]
+            if entry_context_key == context_key:
+                response = self._response_cache.get(entry_key)
+                if response is not None:
+                    return response, embedding
+
+        return None, embedding
+
+    def _cache_store(self, prompt, response, embedding=None):
+        if self._response_cache is None:
+            return
+
+        import numpy as np
+
+        key = self._cache_key(prompt)
+        self._response_cache.set(key, response)
+
+        if embedding is None:
+            return
+
+        entry = (self._cache_context_key(prompt), key)
+        if self._cache_embeddings is None:
+            self._cache_embeddings = embedding[np.newaxis, :]
+        else:
+            self._cache_embeddings = np.vstack([self._cache_embeddings, embedding])[-self.cache_max_entries:]
+        self._cache_entries = (self._cache_entries + [entry])[-self.cache_max_entries:]
+
+    def submit_prompt(self, prompt, **kwargs) -> str:
+        prompt, num_tokens = self._prepare_prompt(prompt)
+
+        cached, embedding = self._cache_lookup(prompt)
+        if cached is not None:
+            return cached
+
+        response = self._extract_content(self.generate_response(prompt, num_tokens))
+        self._cache_store(prompt, response, embedding)
+        return response
+
+    async def asubmit_prompt(self, prompt, **kwargs) -> str:
+        prompt, num_tokens = self._prepare_prompt(prompt)
+
+        cached, embedding = self._cache_lookup(prompt)
+        if cached is not None:
+            return cached
+
+        response = self._extract_content(await self.agenerate_response(prompt, num_tokens))
+        self._cache_store(prompt, response, embedding)
+        return response
+
+    async def submit_prompts_batch(self, prompts, concurrency: int = None, **kwargs) -> list:
+        """
+        Example:
+        ```python
+        responses = await vn.submit_prompts_batch([prompt_1, prompt_2], concurrency=8)
+        ```
+
+        Submits several prompts concurrently, with at most `concurrency` requests in flight.
+
+        Args:
+            prompts (list): The prompts to submit to the LLM.
+            concurrency (int): Maximum number of in-flight requests. Defaults to `config["concurrency"]` (32).
+
+        Returns:
+            list: The responses from the LLM, in the same order as `prompts`.
+        """
+        sem = asyncio.Semaphore(concurrency or self.concurrency)
+
+        async def _one(prompt):
+            async with sem:
+                return await self.asubmit_prompt(prompt, **kwargs)
+
+        # One pooled session or client for the whole batch, closed when the batch finishes
+        scope = self._aiohttp_session_scope() if self.fast_transport == "aiohttp" else self._aclient_scope()
+        async with scope:
+            return await asyncio.gather(*(_one(prompt) for prompt in prompts))
+
+    def submit_prompts_batch_api(self, prompts, poll_interval: int = 30, **kwargs) -> list:
+        """
+        Example:
+        ```python
+        questions = vn.submit_prompts_batch_api(
+            [[vn.system_message("Guess the business question this SQL answers."), vn.user_message(sql)] for sql in sqls]
+        )
+        ```
+
+        Submits prompts through the OpenAI Batch API and blocks until the batch finishes.
+        Batches complete within 24 hours at roughly half the cost of real-time requests,
+        which suits offline jobs such as generating questions for a large SQL corpus.
+
+        Args:
+            prompts (list): The prompts to submit to the LLM.
+            poll_interval (int): Seconds to wait between batch status checks.
+
+        Returns:
+            list: The responses from the LLM, in the same order as `prompts`. Requests that failed
+            (logged from the batch's error file) or did not run before the batch expired or was
+            cancelled are None.
+        """
+        lines = []
+        for i, prompt in enumerate(prompts):
+            prompt, _ = self._prepare_prompt(prompt)
+            body = {"model": self.model, "messages": prompt, "temperature": self.temperature}
+            body.update(self._extra_body(self.client))
+            lines.append(json.dumps({"custom_id": str(i), "method": "POST", "url": "/v1/chat/completions", "body": body}))
+
+        batch_input = io.BytesIO("\n".join(lines).encode("utf-8"))
+        input_file = self.client.files.create(file=("vanna_batch.jsonl", batch_input), purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        self.log(f"Submitted batch {batch.id} with {len(lines)} requests", title="Batch")
+
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            time.sleep(poll_interval)
+            batch = self.client.batches.retrieve(batch.id)
+
+        if batch.status != "completed" and not batch.output_file_id and not batch.error_file_id:
+            raise Exception(f"Batch {batch.id} ended with status {batch.status}: {batch.errors}")
+
+        if batch.status != "completed":
+            self.log(
+                f"Batch {batch.id} ended with status {batch.status}; returning its partial results",
+                title="Batch",
+            )
+
+        responses = [None] * len(prompts)
+        # Successful requests are written to the output file, failed ones to the error file
+        for result in self._read_batch_file(batch.output_file_id) + self._read_batch_file(batch.error_file_id):
+            response = result.get("response") or {}
+            if response.get("status_code") != 200:
+                error = result.get("error") or (response.get("body") or {}).get("error")
+                self.log(
+                    f"Request {result['custom_id']} failed with status {response.get('status_code')}: {error}",
+                    title="Batch",
+                )
+                continue
+            responses[int(result["custom_id"])] = response["body"]["choices"][0]["message"]["content"]
+
+        return responses
+
+    def _read_batch_file(self, file_id) -> list:
+        if not file_id:
+            return []
+
+        content = self.client.files.content(file_id).text
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
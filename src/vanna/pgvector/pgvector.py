@@ -1,19 +1,43 @@
-import ast
+import asyncio
+import functools
 import json
 
+import orjson
 import pandas as pd
 from langchain_core.documents import Document
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_postgres.vectorstores import PGVector
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, make_url, text
+from sqlalchemy.exc import DBAPIError
 
 from .. import ValidationError
 from ..base import VannaBase
+from ..exceptions import DependencyError
 from ..types import TrainingPlan, TrainingPlanItem
 from ..utils import deterministic_uuid
 
 
+@functools.lru_cache(maxsize=1)
+def _default_embedding_function() -> HuggingFaceEmbeddings:
+    # Loaded once per process and shared by every PG_VectorStore without its own embedding_function
+    try:
+        import torch
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    except ImportError:
+        device = "cpu"
+
+    return HuggingFaceEmbeddings(
+        model_name="all-MiniLM-L6-v2",
+        model_kwargs={"device": device},
+        encode_kwargs={"batch_size": 64, "normalize_embeddings": True},
+    )
+
+
 class PG_VectorStore(VannaBase):
+    # Training data ids end with a suffix identifying their collection
+    COLLECTION_SUFFIXES = {"ddl": "ddl", "sql": "sql", "documentation": "doc"}
+
     def __init__(self, config=None):
         VannaBase.__init__(self, config=config)
 
@@ -27,50 +51,139 @@ class PG_VectorStore(VannaBase):
             raise ValidationError("No connection string provided")
         self.n_results = config.get("n_results", 10)
 
+        # Per-instance LRU of similarity search results, keyed by (collection, question, k, version).
+        # The version is bumped whenever training data is added or removed.
+        self._cache_ver = 0
+        self._search_cached = functools.lru_cache(maxsize=config.get("search_cache_size", 512))(self._similarity_search)
+
         self.embedding_function = config.get("embedding_function")
         if not self.embedding_function:
-            self.embedding_function = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+            self.embedding_function = _default_embedding_function()
 
         self.table_schema = config.get("table_schema", "public")
 
+        # One engine shared by the collections and the admin queries, so every call reuses a warm pool
+        self.engine = create_engine(self.connection_string, pool_pre_ping=True, pool_size=5, max_overflow=10)
+        # asyncpg pool for the async admin methods, created on first use
+        self._pool = None
+        self._pool_loop = None
+        self._pool_lock = None
+
         self.sql_collection = PGVector(
             embeddings=self.embedding_function,
             collection_name="sql",
-            connection=self.connection_string,
+            connection=self.engine,
             table_schema=self.table_schema,
         )
 
         self.ddl_collection = PGVector(
             embeddings=self.embedding_function,
             collection_name="ddl",
-            connection=self.connection_string,
+            connection=self.engine,
             table_schema=self.table_schema,
         )
         self.documentation_collection = PGVector(
             embeddings=self.embedding_function,
             collection_name="documentation",
-            connection=self.connection_string,
+            connection=self.engine,
             table_schema=self.table_schema,
         )
 
-    def add_question_sql(self, question: str, sql: str, **kwargs) -> str:
+        self._create_suffix_index()
+
+    def _create_suffix_index(self):
+        # Functional index matching the collection-suffix predicate used by remove_collection
+        statement = text(
+            f"""
+            CREATE INDEX IF NOT EXISTS idx_langchain_pg_embedding_suffix
+            ON {self.table_schema}.langchain_pg_embedding ((right(cmetadata->>'id', 3)))
+        """
+        )
+
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(statement)
+        except Exception as e:
+            print(f"Could not create the id suffix index: {e}")
+
+    def _build_document(self, content: str, suffix: str) -> Document:
+        _id = deterministic_uuid(content) + f"-{suffix}"
+        return Document(page_content=content, metadata={"id": _id})
+
+    def _build_question_sql_document(self, question: str, sql: str) -> Document:
         question_sql_json = json.dumps({"question": question, "sql": sql}, ensure_ascii=False)
-        _id = deterministic_uuid(question_sql_json) + "-sql"
-        doc = Document(page_content=question_sql_json, metadata={"id": _id})
-        self.sql_collection.add_documents([doc], ids=[doc.metadata["id"]])
-        return _id
+        return self._build_document(question_sql_json, "sql")
+
+    def add_question_sql(self, question: str, sql: str, **kwargs) -> str:
+        return self.add_many(question_sql_pairs=[{"question": question, "sql": sql}], reembed=kwargs.get("reembed", False))[0]
 
     def add_ddl(self, ddl: str, **kwargs) -> str:
-        _id = deterministic_uuid(ddl) + "-ddl"
-        doc = Document(page_content=ddl, metadata={"id": _id})
-        self.ddl_collection.add_documents([doc], ids=[doc.metadata["id"]])
-        return _id
+        return self.add_many(ddls=[ddl], reembed=kwargs.get("reembed", False))[0]
 
     def add_documentation(self, documentation: str, **kwargs) -> str:
-        _id = deterministic_uuid(documentation) + "-doc"
-        doc = Document(page_content=documentation, metadata={"id": _id})
-        self.documentation_collection.add_documents([doc], ids=[doc.metadata["id"]])
-        return _id
+        return self.add_many(docs=[documentation], reembed=kwargs.get("reembed", False))[0]
+
+    def _existing_ids(self, ids: list[str]) -> set[str]:
+        if not ids:
+            return set()
+
+        query = text(f"SELECT id FROM {self.table_schema}.langchain_pg_embedding WHERE id = ANY(:ids)")
+        try:
+            with self.engine.connect() as connection:
+                return {row[0] for row in connection.execute(query, {"ids": ids})}
+        except DBAPIError as e:
+            print(f"Could not look up existing training data, re-adding all of it: {e}")
+            return set()
+
+    def add_many(
+        self,
+        question_sql_pairs: list[dict] | None = None,
+        ddls: list[str] | None = None,
+        docs: list[str] | None = None,
+        reembed: bool = False,
+    ) -> list[str]:
+        """
+        Example:
+        ```python
+        vn.add_many(
+            question_sql_pairs=[{"question": "How many customers are there?", "sql": "SELECT COUNT(*) FROM customers"}],
+            ddls=["CREATE TABLE customers (id INT, name TEXT)"],
+            docs=["The customers table contains one row per customer."],
+        )
+        ```
+
+        Adds training data in bulk: each collection receives a single `add_documents` call,
+        so embeddings are computed in one batch and written in one round trip per collection.
+        Ids are content hashes, so training data that is already stored is neither re-embedded
+        nor re-written. Pass `reembed=True` after changing the embedding function to refresh the
+        stored vectors of existing training data.
+
+        Args:
+            question_sql_pairs (list[dict]): Dictionaries with "question" and "sql" keys.
+            ddls (list[str]): DDL statements.
+            docs (list[str]): Documentation strings.
+            reembed (bool): Re-embed and overwrite training data that is already stored.
+
+        Returns:
+            list[str]: The ids of the training data, in the order given.
+        """
+        batches = [
+            (self.sql_collection, [self._build_question_sql_document(p["question"], p["sql"]) for p in question_sql_pairs or []]),
+            (self.ddl_collection, [self._build_document(ddl, "ddl") for ddl in ddls or []]),
+            (self.documentation_collection, [self._build_document(doc, "doc") for doc in docs or []]),
+        ]
+
+        ids = [doc.metadata["id"] for _, documents in batches for doc in documents]
+        existing_ids = set() if reembed else self._existing_ids(ids)
+
+        for collection, documents in batches:
+            # Identical content maps to the same id, which a single upsert cannot write twice
+            documents = {doc.metadata["id"]: doc for doc in documents if doc.metadata["id"] not in existing_ids}
+            if documents:
+                collection.add_documents(list(documents.values()), ids=list(documents.keys()))
+
+        self._invalidate_search_cache()
+        return ids
 
     def get_collection(self, collection_name):
         match collection_name:
@@ -83,17 +196,25 @@ class PG_VectorStore(VannaBase):
             case _:
                 raise ValueError("Specified collection does not exist.")
 
+    def _similarity_search(self, collection_name: str, question: str, k: int, cache_ver: int) -> tuple:
+        documents = self.get_collection(collection_name).similarity_search(query=question, k=k)
+        return tuple(document.page_content for document in documents)
+
+    def _search(self, collection_name: str, question: str) -> tuple:
+        return self._search_cached(collection_name, question, self.n_results, self._cache_ver)
+
+    def _invalidate_search_cache(self):
+        self._cache_ver += 1
+        self._search_cached.cache_clear()
+
     def get_similar_question_sql(self, question: str) -> list:
-        documents = self.sql_collection.similarity_search(query=question, k=self.n_results)
-        return [ast.literal_eval(document.page_content) for document in documents]
+        return [orjson.loads(content) for content in self._search("sql", question)]
 
     def get_related_ddl(self, question: str, **kwargs) -> list:
-        documents = self.ddl_collection.similarity_search(query=question, k=self.n_results)
-        return [document.page_content for document in documents]
+        return list(self._search("ddl", question))
 
     def get_related_documentation(self, question: str, **kwargs) -> list:
-        documents = self.documentation_collection.similarity_search(query=question, k=self.n_results)
-        return [document.page_content for document in documents]
+        return list(self._search("documentation", question))
 
     def train(
         self,
@@ -125,60 +246,100 @@ class PG_VectorStore(VannaBase):
             raise ValidationError("Please provide a SQL query.")
 
         if plan:
+            question_sql_pairs, ddls, docs = [], [], []
             for item in plan._plan:
                 if item.item_type == TrainingPlanItem.ITEM_TYPE_DDL:
-                    self.add_ddl(item.item_value)
+                    ddls.append(item.item_value)
                 elif item.item_type == TrainingPlanItem.ITEM_TYPE_IS:
-                    self.add_documentation(item.item_value)
+                    docs.append(item.item_value)
                 elif item.item_type == TrainingPlanItem.ITEM_TYPE_SQL and item.item_name:
-                    self.add_question_sql(question=item.item_name, sql=item.item_value)
+                    question_sql_pairs.append({"question": item.item_name, "sql": item.item_value})
 
-    def get_training_data(self, **kwargs) -> pd.DataFrame:
-        # Establishing the connection
-        engine = create_engine(self.connection_string)
-
-        # Querying the 'langchain_pg_embedding' table with schema
-        query_embedding = f"SELECT cmetadata, document FROM {self.table_schema}.langchain_pg_embedding"
-        df_embedding = pd.read_sql(query_embedding, engine)
+            self.add_many(question_sql_pairs=question_sql_pairs, ddls=ddls, docs=docs)
 
-        # List to accumulate the processed rows
-        processed_rows = []
+    def get_training_data(self, **kwargs) -> pd.DataFrame:
+        # Let Postgres split the id suffix and unpack the question/SQL JSON, so the
+        # result arrives with its final columns and no per-row work in Python
+        query = text(
+            f"""
+            SELECT
+                id,
+                CASE WHEN sfx = 'sql' THEN document::jsonb->>'question' END AS question,
+                CASE WHEN sfx = 'sql' THEN document::jsonb->>'sql' ELSE document END AS content,
+                CASE WHEN sfx = 'doc' THEN 'documentation' ELSE sfx END AS training_data_type
+            FROM (
+                SELECT cmetadata->>'id' AS id, right(cmetadata->>'id', 3) AS sfx, document
+                FROM {self.table_schema}.langchain_pg_embedding
+            ) AS embedding
+            WHERE sfx IN ('sql', 'ddl', 'doc')
+        """
+        )
 
-        # Process each row in the DataFrame
-        for _, row in df_embedding.iterrows():
-            custom_id = row["cmetadata"]["id"]
-            document = row["document"]
-            training_data_type = "documentation" if custom_id[-3:] == "doc" else custom_id[-3:]
+        try:
+            return pd.read_sql(query, self.engine)
+        except DBAPIError as e:
+            # A SQL document that is not valid JSON fails the cast; parse client-side instead,
+            # which skips and reports the offending rows
+            print(f"Falling back to client-side parsing of training data: {e}")
+            return self._get_training_data_client_side()
+
+    def _get_training_data_client_side(self) -> pd.DataFrame:
+        # Querying the 'langchain_pg_embedding' table with schema, letting Postgres extract the id
+        query_embedding = f"SELECT cmetadata->>'id' AS id, document FROM {self.table_schema}.langchain_pg_embedding"
+        df_embedding = pd.read_sql(query_embedding, self.engine)
+
+        suffix = df_embedding["id"].str[-3:]
+        df_embedding["training_data_type"] = suffix.where(suffix != "doc", "documentation")
+
+        # If the suffix is not recognized, skip the row
+        recognized = df_embedding["training_data_type"].isin(["sql", "ddl", "documentation"])
+        for custom_id in df_embedding.loc[~recognized, "id"]:
+            print(f"Skipping row with custom_id {custom_id} due to unrecognized training data type.")
+        df_embedding = df_embedding[recognized]
+
+        is_sql = df_embedding["training_data_type"] == "sql"
+        df_sql = df_embedding[is_sql]
+        df_other = df_embedding[~is_sql]
+
+        # Convert the SQL documents to dictionaries
+        parsed = df_sql["document"].map(self._parse_question_sql)
+        failed = parsed.isna()
+        for custom_id in df_sql.loc[failed, "id"]:
+            print(f"Skipping row with custom_id {custom_id} due to parsing error.")
+        df_sql = df_sql[~failed]
+        parsed = parsed[~failed]
+
+        df_sql = pd.DataFrame(
+            {
+                "id": df_sql["id"],
+                "question": parsed.map(lambda doc: doc.get("question")),
+                "content": parsed.map(lambda doc: doc.get("sql")),
+                "training_data_type": df_sql["training_data_type"],
+            }
+        )
+        df_other = pd.DataFrame(
+            {
+                "id": df_other["id"],
+                "question": None,
+                "content": df_other["document"],
+                "training_data_type": df_other["training_data_type"],
+            }
+        )
 
-            if training_data_type == "sql":
-                # Convert the document string to a dictionary
-                try:
-                    doc_dict = ast.literal_eval(document)
-                    question = doc_dict.get("question")
-                    content = doc_dict.get("sql")
-                except (ValueError, SyntaxError):
-                    print(f"Skipping row with custom_id {custom_id} due to parsing error.")
-                    continue
-            elif training_data_type in ["documentation", "ddl"]:
-                question = None  # Default value for question
-                content = document
-            else:
-                # If the suffix is not recognized, skip this row
-                print(f"Skipping row with custom_id {custom_id} due to unrecognized training data type.")
-                continue
-
-            # Append the processed data to the list
-            processed_rows.append({"id": custom_id, "question": question, "content": content, "training_data_type": training_data_type})
-
-        # Create a DataFrame from the list of processed rows
-        df_processed = pd.DataFrame(processed_rows)
+        # Restore the original row order
+        df_processed = pd.concat([df_sql, df_other]).sort_index().reset_index(drop=True)
 
         return df_processed
 
-    def remove_training_data(self, id: str, **kwargs) -> bool:
-        # Create the database engine
-        engine = create_engine(self.connection_string)
+    @staticmethod
+    def _parse_question_sql(document: str) -> dict | None:
+        try:
+            doc_dict = orjson.loads(document)
+        except (ValueError, TypeError):
+            return None
+        return doc_dict if isinstance(doc_dict, dict) else None
 
+    def remove_training_data(self, id: str, **kwargs) -> bool:
         # SQL DELETE statement with schema
         delete_statement = text(
             f"""
@@ -188,13 +349,15 @@ class PG_VectorStore(VannaBase):
         )
 
         # Connect to the database and execute the delete statement
-        with engine.connect() as connection:
+        with self.engine.connect() as connection:
             # Start a transaction
             with connection.begin() as transaction:
                 try:
                     result = connection.execute(delete_statement, {"id": id})
                     # Commit the transaction if the delete was successful
                     transaction.commit()
+                    # Only drop cached searches once the rows are gone for good
+                    self._invalidate_search_cache()
                     # Check if any row was deleted and return True or False accordingly
                     return result.rowcount > 0
                 except Exception as e:
@@ -204,11 +367,8 @@ class PG_VectorStore(VannaBase):
                     return False
 
     def remove_collection(self, collection_name: str) -> bool:
-        engine = create_engine(self.connection_string)
-
         # Determine the suffix to look for based on the collection name
-        suffix_map = {"ddl": "ddl", "sql": "sql", "documentation": "doc"}
-        suffix = suffix_map.get(collection_name)
+        suffix = self.COLLECTION_SUFFIXES.get(collection_name)
 
         if not suffix:
             print("Invalid collection name. Choose from 'ddl', 'sql', or 'documentation'.")
@@ -218,16 +378,17 @@ class PG_VectorStore(VannaBase):
         query = text(
             f"""
             DELETE FROM {self.table_schema}.langchain_pg_embedding
-            WHERE cmetadata->>'id' LIKE '%{suffix}'
+            WHERE right(cmetadata->>'id', 3) = :sfx
         """
         )
 
         # Execute the deletion within a transaction block
-        with engine.connect() as connection:
+        with self.engine.connect() as connection:
             with connection.begin() as transaction:
                 try:
-                    result = connection.execute(query)
+                    result = connection.execute(query, {"sfx": suffix})
                     transaction.commit()  # Explicitly commit the transaction
+                    self._invalidate_search_cache()
                     if result.rowcount > 0:
                         print(f"Deleted {result.rowcount} rows from langchain_pg_embedding where collection is {collection_name}.")
                         return True
@@ -239,5 +400,108 @@ class PG_VectorStore(VannaBase):
                     transaction.rollback()  # Rollback in case of error
                     return False
 
+    async def _get_pool(self):
+        try:
+            import asyncpg
+        except ImportError:
+            raise DependencyError(
+                "You need to install required dependencies to execute this method."
+                "\nRun the following command:\n"
+                "pip install asyncpg"
+            )
+
+        # A pool, and the lock guarding its creation, are bound to the event loop they were created on
+        loop = asyncio.get_running_loop()
+        if self._pool_loop is not loop:
+            self._terminate_pool()
+            self._pool_loop = loop
+            self._pool_lock = asyncio.Lock()
+
+        # Concurrent first calls wait for a single pool instead of each creating one
+        async with self._pool_lock:
+            if self._pool is None:
+                # asyncpg expects a plain postgresql:// DSN, without a SQLAlchemy driver suffix
+                dsn = make_url(self.connection_string).set(drivername="postgresql").render_as_string(hide_password=False)
+                self._pool = await asyncpg.create_pool(dsn=dsn, min_size=1, max_size=10)
+
+        return self._pool
+
+    def _terminate_pool(self):
+        # Closes the pool of another event loop without awaiting it, since its connections can only
+        # be closed gracefully on their own loop
+        pool, loop = self._pool, self._pool_loop
+        self._pool = None
+        if pool is None:
+            return
+
+        if loop.is_running():
+            loop.call_soon_threadsafe(pool.terminate)
+            return
+
+        try:
+            pool.terminate()
+        except RuntimeError:
+            # The loop is already closed and cannot schedule the transports' cleanup;
+            # the sockets are released when the pool is garbage collected
+            pass
+
+    async def aremove_training_data(self, id: str, **kwargs) -> bool:
+        pool = await self._get_pool()
+        try:
+            async with pool.acquire() as connection:
+                status = await connection.execute(
+                    f"DELETE FROM {self.table_schema}.langchain_pg_embedding WHERE cmetadata ->> 'id' = $1",
+                    id,
+                )
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            return False
+
+        # The statement ran in its own transaction, which has committed by now
+        self._invalidate_search_cache()
+
+        # asyncpg returns the command status, e.g. "DELETE 1"
+        return int(status.split()[-1]) > 0
+
+    async def aremove_collection(self, collection_name: str) -> bool:
+        suffix = self.COLLECTION_SUFFIXES.get(collection_name)
+
+        if not suffix:
+            print("Invalid collection name. Choose from 'ddl', 'sql', or 'documentation'.")
+            return False
+
+        pool = await self._get_pool()
+        try:
+            async with pool.acquire() as connection:
+                status = await connection.execute(
+                    f"DELETE FROM {self.table_schema}.langchain_pg_embedding WHERE right(cmetadata->>'id', 3) = $1",
+                    suffix,
+                )
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            return False
+
+        self._invalidate_search_cache()
+
+        rowcount = int(status.split()[-1])
+        if rowcount > 0:
+            print(f"Deleted {rowcount} rows from langchain_pg_embedding where collection is {collection_name}.")
+            return True
+        else:
+            print(f"No rows deleted for collection {collection_name}.")
+            return False
+
+    def close(self):
+        self.engine.dispose()
+
+    async def aclose(self):
+        if self._pool is not None and self._pool_loop is asyncio.get_running_loop():
+            pool, self._pool = self._pool, None
+            await pool.close()
+
+        self._terminate_pool()
+        self._pool_loop = None
+        self._pool_lock = None
+
     def generate_embedding(self, *args, **kwargs):
         pass
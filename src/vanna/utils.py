@@ -66,3 +66,106 @@ def deterministic_uuid(content: Union[str, bytes]) -> str:
     content_uuid = str(uuid.uuid5(namespace, hash_hex))
 
     return content_uuid
+
+
+def rerank(query_vec, cand_matrix, k: int):
+    """Finds the k rows of a candidate matrix most similar (cosine) to a query vector.
+
+    Uses SimSIMD's SIMD kernels when installed and falls back to NumPy otherwise.
+
+    Args:
+        query_vec: 1-D query embedding.
+        cand_matrix: 2-D matrix with one candidate embedding per row.
+        k: Number of candidates to return.
+
+    Returns:
+        Tuple of (indices, similarities), ordered from most to least similar.
+    """
+    import numpy as np
+
+    query_vec = np.ascontiguousarray(query_vec, dtype=np.float32).reshape(1, -1)
+    cand_matrix = np.ascontiguousarray(cand_matrix, dtype=np.float32)
+
+    k = min(k, len(cand_matrix))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    try:
+        import simsimd
+
+        scores = 1.0 - np.asarray(simsimd.cdist(query_vec, cand_matrix, metric="cosine")).reshape(-1)
+    except ImportError:
+        norms = np.linalg.norm(cand_matrix, axis=1) * np.linalg.norm(query_vec)
+        norms[norms == 0] = 1.0
+        scores = (cand_matrix @ query_vec[0]) / norms
+
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return top, scores[top]
+
+
+_normalize_kernels = None
+
+
+def _get_normalize_kernels():
+    """Compiles the Numba normalization kernels on first use, or returns None without Numba."""
+    global _normalize_kernels
+
+    if _normalize_kernels is None:
+        try:
+            from numba import njit, prange
+        except ImportError:
+            _normalize_kernels = ()
+            return None
+
+        # Separate 1-D and 2-D kernels: a single kernel branching on ndim fails Numba's typing
+        @njit(fastmath=True)
+        def _normalize_1d(x):
+            n = 0.0
+            for j in range(x.shape[0]):
+                n += x[j] * x[j]
+            n = n**0.5
+            if n > 0.0:
+                for j in range(x.shape[0]):
+                    x[j] /= n
+
+        @njit(parallel=True, fastmath=True)
+        def _normalize_2d(x):
+            for i in prange(x.shape[0]):
+                n = 0.0
+                for j in range(x.shape[1]):
+                    n += x[i, j] * x[i, j]
+                n = n**0.5
+                if n > 0.0:
+                    for j in range(x.shape[1]):
+                        x[i, j] /= n
+
+        _normalize_kernels = (_normalize_1d, _normalize_2d)
+
+    return _normalize_kernels or None
+
+
+def normalize(vectors):
+    """L2-normalizes a vector, or each row of a matrix, leaving zero vectors unchanged.
+
+    Uses JIT-compiled Numba kernels when Numba is installed and falls back to NumPy otherwise.
+
+    Args:
+        vectors: 1-D vector or 2-D matrix of embeddings.
+
+    Returns:
+        A normalized float32 copy of `vectors`.
+    """
+    import numpy as np
+
+    vectors = np.array(vectors, dtype=np.float32)
+    kernels = _get_normalize_kernels()
+
+    if kernels is not None:
+        normalize_1d, normalize_2d = kernels
+        (normalize_1d if vectors.ndim == 1 else normalize_2d)(vectors)
+        return vectors
+
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
@@ -0,0 +1,346 @@
+import json
+
+import pytest
+from openai import AsyncAzureOpenAI, AsyncOpenAI, AzureOpenAI, OpenAI
+from openai.types.chat import ChatCompletion
+
+from vanna.mock import MockEmbedding, MockVectorDB
+from vanna.openai.openai_chat import OpenAI_Chat
+
+
+class VannaOpenAI(MockVectorDB, MockEmbedding, OpenAI_Chat):
+    def __init__(self, client=None, config=None, aclient=None):
+        MockVectorDB.__init__(self, config=config)
+        MockEmbedding.__init__(self, config=config)
+        OpenAI_Chat.__init__(self, client=client, config=config, aclient=aclient)
+
+
+def test_aclient_mirrors_openai_client():
+    client = OpenAI(
+        api_key="sk-test",
+        organization="org-test",
+        project="proj-test",
+        default_headers={"X-Test": "1"},
+        default_query={"q": "1"},
+    )
+    vn = VannaOpenAI(client=client, config={})
+
+    assert type(vn.aclient) is AsyncOpenAI
+    assert vn.aclient.organization == "org-test"
+    assert vn.aclient.project == "proj-test"
+    assert vn.aclient._custom_headers["X-Test"] == "1"
+    assert vn.aclient._custom_query == {"q": "1"}
+
+
+def test_aclient_mirrors_azure_client():
+    client = AzureOpenAI(
+        api_key="azure-key",
+        api_version="2024-02-01",
+        azure_endpoint="https://example.openai.azure.com",
+        azure_deployment="gpt-4o-mini",
+    )
+    vn = VannaOpenAI(client=client, config={})
+
+    assert type(vn.aclient) is AsyncAzureOpenAI
+    assert vn.aclient._custom_query["api-version"] == "2024-02-01"
+    assert str(vn.aclient.base_url) == str(client.base_url)
+
+
+@pytest.mark.parametrize(
+    "credentials, expected",
+    [
+        ({"api_key": "azure-key"}, {"api-key": "azure-key"}),
+        ({"azure_ad_token": "ad-token"}, {"Authorization": "Bearer ad-token"}),
+        ({"azure_ad_token_provider": lambda: "provided-token"}, {"Authorization": "Bearer provided-token"}),
+    ],
+)
+def test_aiohttp_request_options_use_azure_credentials(credentials, expected):
+    import asyncio
+
+    client = AzureOpenAI(api_version="2024-02-01", azure_endpoint="https://example.openai.azure.com", **credentials)
+    vn = VannaOpenAI(client=client, config={})
+
+    _, headers, params = asyncio.run(vn._aiohttp_request_options())
+
+    assert {k: v for k, v in headers.items() if k in ("api-key", "Authorization")} == expected
+    assert params["api-version"] == "2024-02-01"
+
+
+def _chat_completion(content):
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o-mini",
+        "choices": [
+            {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}
+        ],
+    }
+
+
+def test_aiohttp_transport_batches_across_event_loops():
+    import asyncio
+
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+
+    requests = []
+
+    async def handler(request):
+        requests.append(request)
+        body = await request.json()
+        return web.json_response(_chat_completion(body["messages"][-1]["content"].upper()))
+
+    async def run_batch(prompts):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", handler)
+        async with TestServer(app) as server:
+            client = OpenAI(api_key="sk-test", base_url=str(server.make_url("/v1")))
+            vn = VannaOpenAI(client=client, config={"fast_transport": "aiohttp", "prompt_cache_key": None})
+            return await vn.submit_prompts_batch(prompts)
+
+    prompts = [[{"role": "user", "content": question}] for question in ["a", "b", "c"]]
+
+    # Each asyncio.run has its own loop; the session must not leak from one to the next
+    assert asyncio.run(run_batch(prompts)) == ["A", "B", "C"]
+    assert asyncio.run(run_batch(prompts)) == ["A", "B", "C"]
+    assert all(request.headers["Authorization"] == "Bearer sk-test" for request in requests)
+
+
+def test_default_transport_batches_across_event_loops():
+    import asyncio
+
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+
+    async def handler(request):
+        body = await request.json()
+        return web.json_response(_chat_completion(body["messages"][-1]["content"].upper()))
+
+    vn = None
+
+    async def run_batch(prompts, port=None):
+        nonlocal vn
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", handler)
+        async with TestServer(app, port=port) as server:
+            if vn is None:
+                client = OpenAI(api_key="sk-test", base_url=str(server.make_url("/v1")))
+                vn = VannaOpenAI(client=client, config={"prompt_cache_key": None})
+            return await vn.submit_prompts_batch(prompts), server.port
+
+    prompts = [[{"role": "user", "content": question}] for question in ["a", "b", "c"]]
+
+    # The same instance is reused on a second loop; its SDK client must not be bound to the first
+    responses, port = asyncio.run(run_batch(prompts))
+    assert responses == ["A", "B", "C"]
+    responses, _ = asyncio.run(run_batch(prompts, port=port))
+    assert responses == ["A", "B", "C"]
+
+
+class BagOfWordsEmbeddings:
+    def embed_query(self, text):
+        vector = [0.0] * 64
+        for word in text.lower().replace("?", "").split():
+            vector[sum(map(ord, word)) % 64] += 1.0
+        return vector
+
+
+class CountingVannaOpenAI(VannaOpenAI):
+    def __init__(self, config=None):
+        VannaOpenAI.__init__(self, client=OpenAI(api_key="sk-test"), config=config)
+        self.embedding_function = BagOfWordsEmbeddings()
+        self.questions_sent = []
+
+    def generate_response(self, prompt, num_tokens):
+        self.questions_sent.append(prompt[-1]["content"])
+        return ChatCompletion.model_validate(_chat_completion(f"answer to {prompt[-1]['content']}"))
+
+
+def _sql_prompt(vn, question):
+    prompt = [vn.system_message("You are a SQLite expert. CREATE TABLE tracks (id INT, artist_id INT)")]
+    for i in range(10):
+        prompt.append(vn.user_message(f"example question number {i} about invoices and customers"))
+        prompt.append(vn.assistant_message(f"SELECT {i} FROM invoices"))
+    prompt.append(vn.user_message(question))
+    return prompt
+
+
+def test_semantic_cache_misses_for_different_questions_with_shared_examples(tmp_path):
+    vn = CountingVannaOpenAI(config={"cache_dir": str(tmp_path), "prompt_cache_key": None})
+
+    first = vn.submit_prompt(_sql_prompt(vn, "show revenue by month for 2023"))
+    second = vn.submit_prompt(_sql_prompt(vn, "Top 5 artists by number of tracks"))
+
+    assert first == "answer to show revenue by month for 2023"
+    assert second == "answer to Top 5 artists by number of tracks"
+    assert len(vn.questions_sent) == 2
+
+
+def test_semantic_cache_hits_for_near_duplicate_question(tmp_path):
+    vn = CountingVannaOpenAI(config={"cache_dir": str(tmp_path), "prompt_cache_key": None})
+
+    vn.submit_prompt(_sql_prompt(vn, "Top 5 artists by number of tracks"))
+    cached = vn.submit_prompt(_sql_prompt(vn, "top 5 artists by number of tracks?"))
+
+    assert cached == "answer to Top 5 artists by number of tracks"
+    assert len(vn.questions_sent) == 1
+
+
+def test_canonicalize_puts_system_messages_first_and_keeps_conversation_order():
+    vn = VannaOpenAI(client=OpenAI(api_key="sk-test"), config={})
+    prompt = [
+        vn.user_message("example question  "),
+        vn.system_message("You are a SQL expert.\n"),
+        vn.assistant_message("SELECT 1"),
+        vn.system_message("CREATE TABLE t (id INT)"),
+        vn.user_message("question"),
+    ]
+
+    assert vn._canonicalize(prompt) == [
+        vn.system_message("You are a SQL expert."),
+        vn.system_message("CREATE TABLE t (id INT)"),
+        vn.user_message("example question"),
+        vn.assistant_message("SELECT 1"),
+        vn.user_message("question"),
+    ]
+
+
+def test_prompt_cache_key_only_sent_to_openai_by_default():
+    openai_vn = VannaOpenAI(client=OpenAI(api_key="sk-test"), config={"model": "gpt-4o-mini"})
+    local_vn = VannaOpenAI(client=OpenAI(api_key="sk-test", base_url="http://localhost:8000/v1"), config={})
+    explicit_vn = VannaOpenAI(
+        client=OpenAI(api_key="sk-test", base_url="http://localhost:8000/v1"), config={"prompt_cache_key": "k"}
+    )
+
+    assert openai_vn._extra_body(openai_vn.client) == {"prompt_cache_key": "gpt-4o-mini|vanna"}
+    assert local_vn._extra_body(local_vn.client) == {}
+    assert explicit_vn._extra_body(explicit_vn.client) == {"prompt_cache_key": "k"}
+
+
+def test_short_prefix_is_logged_once(capsys):
+    vn = VannaOpenAI(client=OpenAI(api_key="sk-test"), config={})
+    for _ in range(3):
+        vn._prepare_prompt([vn.system_message("short"), vn.user_message("question")])
+
+    assert capsys.readouterr().out.count("Prompt Cache") == 1
+
+
+def test_serialize_request_body_reuses_and_invalidates_prefix():
+    import orjson
+
+    vn = VannaOpenAI(client=OpenAI(api_key="sk-test", base_url="http://localhost:8000/v1"), config={})
+    stable = [vn.system_message("You are a SQL expert."), vn.user_message("example"), vn.assistant_message("SELECT 1")]
+
+    body = vn._serialize_request_body(stable + [vn.user_message("first")])
+    assert orjson.loads(body) == {
+        "model": "gpt-4o-mini",
+        "temperature": 0.7,
+        "messages": stable + [vn.user_message("first")],
+    }
+    prefix = vn._prefix_bytes
+
+    body = vn._serialize_request_body(stable + [vn.user_message("second")])
+    assert vn._prefix_bytes is prefix
+    assert orjson.loads(body)["messages"] == stable + [vn.user_message("second")]
+
+    changed = [vn.system_message("You are a Postgres expert.")] + stable[1:]
+    body = vn._serialize_request_body(changed + [vn.user_message("third")])
+    assert vn._prefix_bytes is not prefix
+    assert orjson.loads(body)["messages"] == changed + [vn.user_message("third")]
+
+
+def test_serialize_request_body_without_stable_messages():
+    import orjson
+
+    vn = VannaOpenAI(client=OpenAI(api_key="sk-test", base_url="http://localhost:8000/v1"), config={})
+
+    body = vn._serialize_request_body([vn.user_message("only")])
+
+    assert orjson.loads(body)["messages"] == [vn.user_message("only")]
+
+
+class FakeBatchClient:
+    """Stands in for the files/batches endpoints of an OpenAI client."""
+
+    def __init__(self, status, output_lines, error_lines):
+        from types import SimpleNamespace
+
+        self.base_url = SimpleNamespace(host="localhost")
+        contents = {"output": output_lines, "errors": error_lines}
+        batch = SimpleNamespace(
+            id="batch-1",
+            status=status,
+            errors=None,
+            output_file_id="output" if output_lines else None,
+            error_file_id="errors" if error_lines else None,
+        )
+        self.files = SimpleNamespace(
+            create=lambda **kwargs: SimpleNamespace(id="input"),
+            content=lambda file_id: SimpleNamespace(
+                text="\n".join(json.dumps(line) for line in contents[file_id])
+            ),
+        )
+        self.batches = SimpleNamespace(create=lambda **kwargs: batch, retrieve=lambda batch_id: batch)
+
+
+def _batch_result(custom_id, status_code, body):
+    return {"custom_id": custom_id, "response": {"status_code": status_code, "body": body}, "error": None}
+
+
+def test_submit_prompts_batch_api_logs_failed_requests(capsys):
+    client = FakeBatchClient(
+        "completed",
+        output_lines=[_batch_result("0", 200, _chat_completion("first"))],
+        error_lines=[_batch_result("1", 400, {"error": {"message": "bad request"}})],
+    )
+    vn = VannaOpenAI(client=client, config={})
+
+    responses = vn.submit_prompts_batch_api([[vn.user_message("a")], [vn.user_message("b")]], poll_interval=0)
+
+    assert responses == ["first", None]
+    assert "Request 1 failed with status 400" in capsys.readouterr().out
+
+
+def test_submit_prompts_batch_api_returns_partial_results_of_expired_batch(capsys):
+    client = FakeBatchClient("expired", output_lines=[_batch_result("1", 200, _chat_completion("second"))], error_lines=[])
+    vn = VannaOpenAI(client=client, config={})
+
+    responses = vn.submit_prompts_batch_api([[vn.user_message("a")], [vn.user_message("b")]], poll_interval=0)
+
+    assert responses == [None, "second"]
+    assert "ended with status expired" in capsys.readouterr().out
+
+
+def test_aiohttp_transport_retries_rate_limited_requests(monkeypatch):
+    import asyncio
+
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+    from tenacity import wait_none
+
+    monkeypatch.setattr(OpenAI_Chat.agenerate_response.retry, "wait", wait_none())
+    statuses = [429, 503]
+
+    async def handler(request):
+        if statuses:
+            return web.json_response({"error": {"message": "try again"}}, status=statuses.pop(0))
+        return web.json_response(_chat_completion("ok"))
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", handler)
+        async with TestServer(app) as server:
+            client = OpenAI(api_key="sk-test", base_url=str(server.make_url("/v1")))
+            vn = VannaOpenAI(client=client, config={"fast_transport": "aiohttp"})
+            return await vn.asubmit_prompt([vn.user_message("question")])
+
+    assert asyncio.run(run()) == "ok"
+    assert statuses == []
+
+
+def test_lazily_created_clients_disable_sdk_retries():
+    vn = VannaOpenAI(config={"api_key": "sk-test"})
+
+    assert vn.client.max_retries == 0
+    assert vn.aclient.max_retries == 0
@@ -0,0 +1,75 @@
+import sys
+
+import numpy as np
+import pytest
+
+from vanna import utils
+from vanna.utils import rerank
+
+
+@pytest.fixture(params=["simsimd", "numpy"])
+def rerank_backend(request, monkeypatch):
+    if request.param == "simsimd":
+        pytest.importorskip("simsimd")
+    else:
+        # A None entry in sys.modules makes `import simsimd` raise ImportError
+        monkeypatch.setitem(sys.modules, "simsimd", None)
+    return request.param
+
+
+def test_rerank_orders_by_cosine_similarity(rerank_backend):
+    candidates = np.array([[0.0, 1.0], [1.0, 0.1], [1.0, 1.0], [-1.0, 0.0]])
+
+    indices, scores = rerank([1.0, 0.0], candidates, k=3)
+
+    assert indices.tolist() == [1, 2, 0]
+    assert scores[0] == pytest.approx(1.0 / np.sqrt(1.01), abs=1e-4)
+    assert list(scores) == sorted(scores, reverse=True)
+
+
+def test_rerank_k_larger_than_candidates(rerank_backend):
+    candidates = np.array([[1.0, 0.0], [0.0, 1.0]])
+
+    indices, scores = rerank([0.0, 2.0], candidates, k=10)
+
+    assert indices.tolist() == [1, 0]
+    assert len(scores) == 2
+
+
+def test_rerank_empty_matrix(rerank_backend):
+    indices, scores = rerank([1.0, 0.0], np.empty((0, 2)), k=5)
+
+    assert len(indices) == 0
+    assert len(scores) == 0
+
+
+@pytest.fixture(params=["numba", "numpy"])
+def normalize_backend(request, monkeypatch):
+    if request.param == "numba":
+        pytest.importorskip("numba")
+        monkeypatch.setattr(utils, "_normalize_kernels", None)
+    else:
+        # An empty tuple marks Numba as unavailable
+        monkeypatch.setattr(utils, "_normalize_kernels", ())
+    return request.param
+
+
+def test_normalize_1d(normalize_backend):
+    vector = [3.0, 4.0]
+
+    normalized = utils.normalize(vector)
+
+    assert normalized.dtype == np.float32
+    assert normalized.tolist() == pytest.approx([0.6, 0.8])
+    assert vector == [3.0, 4.0]
+
+
+def test_normalize_2d(normalize_backend):
+    normalized = utils.normalize([[3.0, 4.0], [0.0, 2.0]])
+
+    assert normalized.tolist() == [pytest.approx([0.6, 0.8]), pytest.approx([0.0, 1.0])]
+
+
+def test_normalize_leaves_zero_vectors_unchanged(normalize_backend):
+    assert utils.normalize([0.0, 0.0]).tolist() == [0.0, 0.0]
+    assert utils.normalize([[0.0, 0.0], [1.0, 0.0]]).tolist() == [[0.0, 0.0], [1.0, 0.0]]